@@ -4,10 +4,12 @@ Orchestrates the complete NBA Pub/Sub demonstration.
 Runs producer and consumers to show end-to-end message flow.
 """
 
+import asyncio
+import logging
+import multiprocessing
 import os
 import sys
-import time
-import threading
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 # Add src to path
@@ -17,8 +19,68 @@ from producer.game_simulator import NBAEventProducer
 from consumers.stats_service import StatsService
 from consumers.notification_service import NotificationService
 
+# gRPC channels aren't fork-safe, so consumer processes start from a fresh
+# interpreter and build their own clients
+MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def _log_to_queue(log_queue: multiprocessing.Queue):
+    """Send this process's log records to the shared log queue"""
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
+
+def configure_logging(log_queue: multiprocessing.Queue) -> QueueListener:
+    """Route log records through a queue drained by a background thread"""
+    # Callbacks only enqueue records; the listener thread does the writes
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(message)s"))
+    _log_to_queue(log_queue)
+
+    listener = QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
+
+
+def _run_stats(
+    project_id: str,
+    subscription_name: str,
+    timeout: int,
+    log_queue: multiprocessing.Queue,
+):
+    """Stats consumer process entry point"""
+    _log_to_queue(log_queue)
+    service = StatsService(project_id, subscription_name)
+    service.start_listening(timeout)
+    service.close()
+
+
+def _run_notifications(
+    project_id: str,
+    subscription_name: str,
+    timeout: int,
+    log_queue: multiprocessing.Queue,
+):
+    """Notification consumer process entry point"""
+    _log_to_queue(log_queue)
+    service = NotificationService(project_id, subscription_name)
+    service.start_listening(timeout)
+    service.close()
+
+
+async def run_producer(producer: NBAEventProducer):
+    """Publish game events once the consumers have had time to start"""
+    # Give consumers time to start
+    print("Waiting for consumers to initialize...")
+    await asyncio.sleep(3)
+
+    print("\nStarting game event simulation...")
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, producer.simulate_game_events, 15)
+
 
-def run_demo():
+async def run_demo(log_queue: multiprocessing.Queue):
     """Run the complete NBA Pub/Sub demo"""
     project_id = os.getenv("PROJECT_ID")
     if not project_id:
@@ -29,35 +91,29 @@ def run_demo():
 
     # Create services
     producer = NBAEventProducer(project_id, "nba-game-events")
-    stats_service = StatsService(project_id, "stats-service-pull")
-    notification_service = NotificationService(project_id, "notification-service-flaky")
 
-    # Start consumers in separate threads
+    # Start consumers in their own processes so they don't share a GIL
+    # with the producer or each other
     print("Starting consumer services...")
-    stats_thread = threading.Thread(
-        target=stats_service.start_listening, args=(45,), name="StatsService"
+    stats_process = MP_CONTEXT.Process(
+        target=_run_stats,
+        args=(project_id, "stats-service-pull", 45, log_queue),
+        name="StatsService",
     )
-    notification_thread = threading.Thread(
-        target=notification_service.start_listening,
-        args=(45,),
+    notification_process = MP_CONTEXT.Process(
+        target=_run_notifications,
+        args=(project_id, "notification-service-flaky", 45, log_queue),
         name="NotificationService",
     )
+    stats_process.start()
+    notification_process.start()
 
-    stats_thread.start()
-    notification_thread.start()
-
-    # Give consumers time to start
-    print("Waiting for consumers to initialize...")
-    time.sleep(3)
-
-    # Simulate game events
-    print("\nStarting game event simulation...")
-    producer.simulate_game_events(15)
+    loop = asyncio.get_running_loop()
+    stats_task = loop.run_in_executor(None, stats_process.join)
+    notification_task = loop.run_in_executor(None, notification_process.join)
 
     # Wait for processing to complete
-    print("\nWaiting for message processing to complete...")
-    stats_thread.join()
-    notification_thread.join()
+    await asyncio.gather(stats_task, notification_task, run_producer(producer))
 
     print("\nDemo Complete!")
     print("\nNext steps to explore:")
@@ -72,4 +128,9 @@ def run_demo():
 
 
 if __name__ == "__main__":
-    run_demo()
+    log_queue = MP_CONTEXT.Queue()
+    listener = configure_logging(log_queue)
+    try:
+        asyncio.run(run_demo(log_queue))
+    finally:
+        listener.stop()
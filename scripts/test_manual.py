@@ -3,8 +3,10 @@
 Provides functions for manual testing and gcloud command examples.
 """
 
+import logging
 import os
 import sys
+from concurrent import futures
 from pathlib import Path
 
 # Add src to path
@@ -24,13 +26,16 @@ def publish_test_events():
     print("Publishing test events...")
 
     # Publish a star player scoring event (will trigger both stats and fantasy)
-    producer.publish_single_event("LeBron Jame", "score")
+    star_score = producer.publish_single_event("LeBron Jame", "score")
 
     # Publish a regular player rebound (will only trigger stats)
-    producer.publish_single_event("James Harden", "rebound")
+    regular_rebound = producer.publish_single_event("James Harden", "rebound")
 
     # Publish a random event
-    producer.publish_single_event()
+    random_event = producer.publish_single_event()
+
+    # Publishes are batched, so wait for them before the script exits
+    futures.wait([star_score, regular_rebound, random_event])
 
     print("Test events published!")
 
@@ -78,6 +83,7 @@ if __name__ == "__main__":
     parser.add_argument("--commands", action="store_true", help="Show gcloud commands")
 
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
 
     if args.publish:
         publish_test_events()
@@ -4,50 +4,105 @@ Demonstrates error handling and dead letter queues.
 Intentionally fails some messages to show retry behavior.
 """
 
-import json
+import logging
+import orjson
 import random
 import os
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from collections import OrderedDict
 from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.subscriber.message import Message
+from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on parsed payloads kept around for redelivered messages
+PARSED_CACHE_SIZE = 2048
+
+# Callback threads for each streaming pull
+CALLBACK_WORKERS_PER_STREAM = 4
 
 
 class NotificationService:
     def __init__(
-        self, project_id: str, subscription_name: str, failure_rate: float = 0.4
+        self,
+        project_id: str,
+        subscription_name: str,
+        failure_rate: float = 0.4,
+        parallel_pull_count: int = 1,
+        max_messages: int = 5,
+        max_bytes: int = 5_000_000,
     ):
+        # Long-lived client; it stays open across start_listening calls
         self.subscriber = pubsub_v1.SubscriberClient()
         self.subscription_path = self.subscriber.subscription_path(
             project_id, subscription_name
         )
         self.failure_rate = failure_rate
+        self.parallel_pull_count = parallel_pull_count
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
         self.processed_count = 0
         self.failed_count = 0
-
-    def process_message(self, message: pubsub_v1.subscriber.message.Message):
+        self._parsed_cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._parsed_cache_lock = threading.Lock()
+
+    def _parse(self, message: Message) -> dict:
+        """Parse message data, reusing the result for redelivered messages"""
+        with self._parsed_cache_lock:
+            data = self._parsed_cache.get(message.message_id)
+            if data is not None:
+                self._parsed_cache.move_to_end(message.message_id)
+                return data
+
+        data = orjson.loads(message.data)
+        with self._parsed_cache_lock:
+            self._parsed_cache[message.message_id] = data
+            if len(self._parsed_cache) > PARSED_CACHE_SIZE:
+                self._parsed_cache.popitem(last=False)
+        return data
+
+    def _forget(self, message: Message):
+        """Drop a cached payload once the message won't be redelivered"""
+        with self._parsed_cache_lock:
+            self._parsed_cache.pop(message.message_id, None)
+
+    def process_message(self, message: Message):
         """Process notification with intentional failures"""
         try:
-            data = json.loads(message.data.decode("utf-8"))
+            data = self._parse(message)
             player = data["player"]
             event = data["event"]
 
             # Simulate random failures
             if random.random() < self.failure_rate:
                 self.failed_count += 1
-                print(
-                    f"Notification FAILED for: {player} {event} (failure #{self.failed_count})"
+                logger.info(
+                    "Notification FAILED for: %s %s (failure #%d)",
+                    player,
+                    event,
+                    self.failed_count,
                 )
-                # Don't acknowledge - this will cause retry and eventually dead letter
+                # Don't acknowledge - this will cause retry and eventually dead letter.
+                # The subscription's retry_policy spaces out the redeliveries.
                 message.nack()
                 return
 
             # Simulate successful notification
             self.processed_count += 1
-            print(
-                f"Notification sent: {player} {event} (success #{self.processed_count})"
+            logger.info(
+                "Notification sent: %s %s (success #%d)",
+                player,
+                event,
+                self.processed_count,
             )
+            self._forget(message)
             message.ack()
 
         except Exception as e:
-            print(f"Error in notification service: {e}")
+            logger.error("Error in notification service: %s", e)
             message.nack()
 
     def start_listening(self, timeout: int = 30):
@@ -56,23 +111,46 @@ class NotificationService:
             f"Notification Service listening (with {self.failure_rate * 100}% failure rate)..."
         )
 
-        flow_control = pubsub_v1.types.FlowControl(max_messages=5)
+        flow_control = pubsub_v1.types.FlowControl(
+            max_messages=self.max_messages, max_bytes=self.max_bytes
+        )
 
-        with self.subscriber:
-            try:
-                streaming_pull_future = self.subscriber.subscribe(
-                    self.subscription_path,
-                    callback=self.process_message,
-                    flow_control=flow_control,
+        streaming_pull_futures = []
+        try:
+            # Each stream tops out around 10 MB/s, so open several in parallel
+            for _ in range(self.parallel_pull_count):
+                streaming_pull_futures.append(
+                    self.subscriber.subscribe(
+                        self.subscription_path,
+                        callback=self.process_message,
+                        flow_control=flow_control,
+                        scheduler=ThreadScheduler(
+                            ThreadPoolExecutor(max_workers=CALLBACK_WORKERS_PER_STREAM)
+                        ),
+                        await_callbacks_on_shutdown=True,
+                    )
                 )
 
-                streaming_pull_future.result(timeout=timeout)
+            done, _ = futures.wait(
+                streaming_pull_futures,
+                timeout=timeout,
+                return_when=futures.FIRST_EXCEPTION,
+            )
+            for streaming_pull_future in done:
+                streaming_pull_future.result()
 
-            except Exception as e:
-                print(f"Notification service stopped: {e}")
-            finally:
+        except Exception as e:
+            print(f"Notification service stopped: {e}")
+        finally:
+            for streaming_pull_future in streaming_pull_futures:
                 streaming_pull_future.cancel()
-                self.print_summary()
+            # Let in-flight callbacks finish before reporting
+            futures.wait(streaming_pull_futures)
+            self.print_summary()
+
+    def close(self):
+        """Close the subscriber client once the service is done listening"""
+        self.subscriber.close()
 
     def print_summary(self):
         """Print processing summary"""
@@ -86,9 +164,12 @@ class NotificationService:
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     project_id = os.getenv("PROJECT_ID")
     if not project_id:
         raise ValueError("PROJECT_ID environment variable must be set")
 
     service = NotificationService(project_id, "notification-service-flaky")
     service.start_listening(60)
+    service.close()
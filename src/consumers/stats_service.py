@@ -4,84 +4,147 @@ Demonstrates pull-based message consumption with message filtering.
 Only processes scoring events due to subscription filter.
 """
 
-import json
+import logging
+import orjson
 import os
+import threading
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
 from typing import Dict, Any
 
+logger = logging.getLogger(__name__)
+
+# Callback threads for each streaming pull
+CALLBACK_WORKERS_PER_STREAM = 4
+
 
 class StatsService:
-    def __init__(self, project_id: str, subscription_name: str):
+    def __init__(
+        self,
+        project_id: str,
+        subscription_name: str,
+        parallel_pull_count: int = 4,
+        max_messages: int = 1000,
+        max_bytes: int = 100 * 1024 * 1024,
+    ):
+        # Long-lived client; it stays open across start_listening calls
         self.subscriber = pubsub_v1.SubscriberClient()
         self.subscription_path = self.subscriber.subscription_path(
             project_id, subscription_name
         )
-        self.player_stats: Dict[str, Dict[str, int]] = {}
+        self.parallel_pull_count = parallel_pull_count
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        # Per-player stats as parallel lists indexed by a small int id
+        self._player_ids: Dict[str, int] = {}
+        self._totals: list[int] = []
+        self._counts: list[int] = []
+        self._register_lock = threading.Lock()
+
+    def _register_player(self, player: str) -> int:
+        """Allocate a stats slot for a player seen for the first time"""
+        with self._register_lock:
+            pid = self._player_ids.get(player)
+            if pid is None:
+                pid = len(self._totals)
+                self._totals.append(0)
+                self._counts.append(0)
+                self._player_ids[player] = pid
+            return pid
 
     def process_message(self, message: pubsub_v1.subscriber.message.Message):
         """Process a single stats message"""
         try:
             # Parse message data
-            data = json.loads(message.data.decode("utf-8"))
+            data = orjson.loads(message.data)
             player = data["player"]
             points = data["points"]
             event = data["event"]
 
             # Update stats
-            if player not in self.player_stats:
-                self.player_stats[player] = {"total_points": 0, "events": 0}
-
-            self.player_stats[player]["total_points"] += points
-            self.player_stats[player]["events"] += 1
-
-            print(f"Stats Updated: {player} - {event} (+{points} pts)")
-            print(
-                f"  Total: {self.player_stats[player]['total_points']} points in {self.player_stats[player]['events']} events"
+            pid = self._player_ids.get(player)
+            if pid is None:
+                pid = self._register_player(player)
+
+            self._totals[pid] += points
+            self._counts[pid] += 1
+
+            logger.info("Stats Updated: %s - %s (+%s pts)", player, event, points)
+            logger.info(
+                "  Total: %s points in %s events",
+                self._totals[pid],
+                self._counts[pid],
             )
 
             # Acknowledge message
             message.ack()
 
         except Exception as e:
-            print(f"Error processing stats message: {e}")
+            logger.error("Error processing stats message: %s", e)
             message.nack()
 
     def start_listening(self, timeout: int = 30):
         """Start pulling messages"""
         print(f"Stats Service listening for {timeout} seconds...")
 
-        flow_control = pubsub_v1.types.FlowControl(max_messages=10)
+        flow_control = pubsub_v1.types.FlowControl(
+            max_messages=self.max_messages, max_bytes=self.max_bytes
+        )
 
-        with self.subscriber:
-            try:
-                # Consumer actively asks: "Any new messages?" (pull pattern)
-                streaming_pull_future = self.subscriber.subscribe(
-                    self.subscription_path,
-                    callback=self.process_message,
-                    flow_control=flow_control,
+        streaming_pull_futures = []
+        try:
+            # Consumer actively asks: "Any new messages?" (pull pattern)
+            # Each stream tops out around 10 MB/s, so open several in parallel
+            for _ in range(self.parallel_pull_count):
+                streaming_pull_futures.append(
+                    self.subscriber.subscribe(
+                        self.subscription_path,
+                        callback=self.process_message,
+                        flow_control=flow_control,
+                        scheduler=ThreadScheduler(
+                            ThreadPoolExecutor(max_workers=CALLBACK_WORKERS_PER_STREAM)
+                        ),
+                        await_callbacks_on_shutdown=True,
+                    )
                 )
 
-                streaming_pull_future.result(timeout=timeout)
+            done, _ = futures.wait(
+                streaming_pull_futures,
+                timeout=timeout,
+                return_when=futures.FIRST_EXCEPTION,
+            )
+            for streaming_pull_future in done:
+                streaming_pull_future.result()
 
-            except Exception as e:
-                print(f"Stats service stopped: {e}")
-            finally:
+        except Exception as e:
+            print(f"Stats service stopped: {e}")
+        finally:
+            for streaming_pull_future in streaming_pull_futures:
                 streaming_pull_future.cancel()
-                self.print_final_stats()
+            # Let in-flight callbacks finish before reporting
+            futures.wait(streaming_pull_futures)
+            self.print_final_stats()
+
+    def close(self):
+        """Close the subscriber client once the service is done listening"""
+        self.subscriber.close()
 
     def print_final_stats(self):
         """Print final statistics"""
         print("\nFINAL PLAYER STATS:")
-        for player, stats in self.player_stats.items():
-            print(
-                f"  {player}: {stats['total_points']} points, {stats['events']} events"
-            )
+        for player, pid in self._player_ids.items():
+            print(f"  {player}: {self._totals[pid]} points, {self._counts[pid]} events")
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     project_id = os.getenv("PROJECT_ID")
     if not project_id:
         raise ValueError("PROJECT_ID environment variable must be set")
 
     service = StatsService(project_id, "stats-service-pull")
     service.start_listening(60)
+    service.close()
@@ -4,27 +4,51 @@ Receives push notifications from Pub/Sub and calculates fantasy points.
 Demonstrates push-based message consumption.
 """
 
-import json
+import asyncio
 import base64
+import logging
+import orjson
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any
+from fastapi.responses import ORJSONResponse
+from typing import Dict
 
-app = FastAPI(title="NBA Fantasy Calculator", version="1.0.0")
+logger = logging.getLogger(__name__)
 
-# Fantasy point values
-FANTASY_POINTS = {
-    "score": {"2": 2, "3": 3},
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the background task that applies fantasy point updates"""
+    update_task = asyncio.create_task(calculator.apply_updates())
+    try:
+        yield
+    finally:
+        update_task.cancel()
+        try:
+            await update_task
+        except asyncio.CancelledError:
+            pass
+
+
+app = FastAPI(
+    title="NBA Fantasy Calculator",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+# Fantasy point values, keyed by points scored for scoring events
+FANTASY_POINTS_SCORE = {2: 2.0, 3: 3.0}
+FANTASY_POINTS_OTHER = {
     "rebound": 1.2,
     "assist": 1.5,
     "steal": 2.0,
     "block": 2.0,
 }
 
-
-class PubSubMessage(BaseModel):
-    message: Dict[str, Any]
+# Pending (player, fantasy_points) updates before push handlers wait for room
+UPDATE_QUEUE_SIZE = 10000
 
 
 class FantasyCalculator:
@@ -32,40 +56,42 @@ class FantasyCalculator:
         self.total_events = 0
         self.total_fantasy_points = 0.0
         self.player_totals: Dict[str, float] = {}
+        self.updates: asyncio.Queue = asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE)
 
     def calculate_fantasy_points(self, event_data: dict, attributes: dict) -> float:
         """Calculate fantasy points for an NBA event"""
         event_type = attributes.get("event_type")
-        points_scored = int(attributes.get("points", 0))
-
-        fantasy_points = 0.0
         if event_type == "score":
-            fantasy_points = FANTASY_POINTS["score"].get(str(points_scored), 0)
-        else:
-            fantasy_points = FANTASY_POINTS.get(event_type, 0)
+            return FANTASY_POINTS_SCORE.get(int(attributes.get("points", 0)), 0.0)
+        return FANTASY_POINTS_OTHER.get(event_type, 0.0)
 
-        return fantasy_points
-
-    def process_event(self, event_data: dict, attributes: dict) -> dict:
-        """Process a single NBA event and return fantasy points"""
+    async def process_event(self, event_data: dict, attributes: dict) -> dict:
+        """Score a single NBA event and queue it for the running totals"""
         player = event_data["player"]
         fantasy_points = self.calculate_fantasy_points(event_data, attributes)
 
-        # Update totals
-        self.total_events += 1
-        self.total_fantasy_points += fantasy_points
-
-        if player not in self.player_totals:
-            self.player_totals[player] = 0.0
-        self.player_totals[player] += fantasy_points
+        # Totals are applied by apply_updates, so the push can be acked now
+        await self.updates.put((player, fantasy_points))
 
         return {
             "player": player,
             "event": event_data["event"],
             "fantasy_points": fantasy_points,
-            "player_total": self.player_totals[player],
         }
 
+    async def apply_updates(self):
+        """Drain queued updates into the running totals"""
+        while True:
+            player, fantasy_points = await self.updates.get()
+
+            self.total_events += 1
+            self.total_fantasy_points += fantasy_points
+
+            player_totals = self.player_totals
+            player_totals[player] = player_totals.get(player, 0.0) + fantasy_points
+
+            self.updates.task_done()
+
 
 # Global calculator instance
 calculator = FantasyCalculator()
@@ -88,7 +114,7 @@ async def get_stats():
     return {
         "total_events": calculator.total_events,
         "total_fantasy_points": calculator.total_fantasy_points,
-        "player_totals": calculator.player_totals,
+        "player_totals": dict(calculator.player_totals),
     }
 
 
@@ -96,44 +122,41 @@ async def get_stats():
 async def handle_pubsub_push(request: Request):
     """Handle Pub/Sub push notifications"""
     try:
-        # Parse the Pub/Sub message
-        body = await request.json()
-
-        if "message" not in body:
-            raise HTTPException(status_code=400, detail="No Pub/Sub message found")
-
-        pubsub_message = body["message"]
-
-        # Decode message data
-        if "data" not in pubsub_message:
-            raise HTTPException(status_code=400, detail="No message data found")
-
-        message_data = base64.b64decode(pubsub_message["data"]).decode("utf-8")
-        attributes = pubsub_message.get("attributes", {})
+        # Parse the Pub/Sub envelope and pull out only the fields we use
+        body = orjson.loads(await request.body())
+        msg = body["message"]
+        data_b64 = msg["data"]
+        attributes = msg.get("attributes", {})
 
         # Parse the NBA event
-        event_data = json.loads(message_data)
+        event_data = orjson.loads(base64.b64decode(data_b64))
 
         # Process the event
-        result = calculator.process_event(event_data, attributes)
+        result = await calculator.process_event(event_data, attributes)
 
-        print(
-            f"Fantasy Calculator: {result['player']} earned {result['fantasy_points']} fantasy points"
+        logger.info(
+            "Fantasy Calculator: %s earned %s fantasy points",
+            result["player"],
+            result["fantasy_points"],
         )
-        print(f"  Player total: {result['player_total']} points")
 
-        return {"status": "success", "result": result}
+        return {"status": "accepted", "result": result}
 
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
+    except orjson.JSONDecodeError as e:
+        logger.error("JSON decode error: %s", e)
         raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    except KeyError as e:
+        logger.error("Missing field in Pub/Sub message: %s", e)
+        raise HTTPException(status_code=400, detail=f"Missing field: {e}")
     except Exception as e:
-        print(f"Error processing message: {e}")
+        logger.error("Error processing message: %s", e)
         raise HTTPException(status_code=500, detail=f"Processing error: {e}")
 
 
 if __name__ == "__main__":
     import uvicorn
 
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     port = int(os.getenv("PORT", 8080))
     uvicorn.run(app, host="0.0.0.0", port=port)
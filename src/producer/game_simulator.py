@@ -4,13 +4,22 @@ Simulates real NBA game events and publishes them to Pub/Sub.
 Demonstrates message publishing with attributes for filtering.
 """
 
-import json
+import logging
+import numpy as np
+import orjson
 import random
+import threading
 import time
+import types
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from google.cloud import pubsub_v1
+from google.cloud.pubsub_v1.publisher.futures import Future
 import os
 
+logger = logging.getLogger(__name__)
+
 # NBA data for realistic events
 NBA_PLAYERS = [
     {"name": "LeBron James", "team": "LAL", "rating": "star"},
@@ -29,62 +38,144 @@ EVENT_TYPES = [
     {"type": "block", "points": [0], "description": "blocked a shot"},
 ]
 
+GAME_ID = "LAL_vs_GSW_2024_01_15"
+
+# Immutable per-player (name, team, rating) and per-event
+# (type, description, points) tuples, built once at import
+_PLAYER_CACHE = {p["name"]: (p["name"], p["team"], p["rating"]) for p in NBA_PLAYERS}
+_EVENT_CACHE = {
+    e["type"]: (e["type"], e["description"], tuple(e["points"])) for e in EVENT_TYPES
+}
+_PLAYERS = tuple(_PLAYER_CACHE.values())
+_EVENTS = tuple(_EVENT_CACHE.values())
+
+# Point choices per event type, padded into one table so a whole game's
+# worth of random picks can be drawn with NumPy in one go
+_POINT_CHOICE_COUNTS = np.array([len(e[2]) for e in _EVENTS])
+_POINTS_TABLE = np.array(
+    [e[2] + (0,) * (_POINT_CHOICE_COUNTS.max() - len(e[2])) for e in _EVENTS],
+    dtype=np.int64,
+)
+
+# Frozen publish attributes per (player name, event type, points), filled lazily
+_ATTR_CACHE: dict[tuple[str, str, int], types.MappingProxyType] = {}
+
+
+def _attributes_for(player: tuple, event: tuple, points: int) -> types.MappingProxyType:
+    """Message attributes for filtering, shared across publishes"""
+    key = (player[0], event[0], points)
+    attributes = _ATTR_CACHE.get(key)
+    if attributes is None:
+        attributes = types.MappingProxyType(
+            {
+                "event_type": event[0],
+                "player_rating": player[2],
+                "team": player[1],
+                "points": str(points),
+            }
+        )
+        _ATTR_CACHE[key] = attributes
+    return attributes
+
+
+# Let the client coalesce publishes into fewer RPCs instead of one per event
+BATCH_SETTINGS = pubsub_v1.types.BatchSettings(
+    max_messages=500,
+    max_bytes=1024 * 1024,
+    max_latency=0.05,
+)
+
+# One publisher (and gRPC channel) per process, shared by every producer
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def _get_publisher() -> pubsub_v1.PublisherClient:
+    """Return the process-wide publisher client, creating it on first use"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = pubsub_v1.PublisherClient(batch_settings=BATCH_SETTINGS)
+        return _publisher
+
 
 class NBAEventProducer:
     def __init__(self, project_id: str, topic_name: str):
-        self.publisher = pubsub_v1.PublisherClient()
+        self.publisher = _get_publisher()
         self.topic_path = self.publisher.topic_path(project_id, topic_name)
+        # (epoch second, ISO string for that second), replaced as one tuple
+        self._last_ts = (0, "")
+
+    def _timestamp(self) -> str:
+        """ISO timestamp, formatting the date/time part only once per second"""
+        now = time.time()
+        sec = int(now)
+        last_sec, last_str = self._last_ts
+        if sec != last_sec:
+            last_str = datetime.fromtimestamp(sec).isoformat()
+            self._last_ts = (sec, last_str)
+        return f"{last_str}.{int((now - sec) * 1e6):06d}"
+
+    def publish_single_event(
+        self, player_name: str = "", event_type: str = ""
+    ) -> Future:
+        """Publish a single NBA event without waiting for the server ack"""
+        # Unknown names/types fall back to a random pick
+        player = _PLAYER_CACHE.get(player_name) or random.choice(_PLAYERS)
+        event = _EVENT_CACHE.get(event_type) or random.choice(_EVENTS)
+
+        return self._publish(player, event, random.choice(event[2]))
+
+    def _publish_one(self) -> Future:
+        """Publish one random event without waiting for the server ack"""
+        event = random.choice(_EVENTS)
+        return self._publish(
+            random.choice(_PLAYERS), event, random.choice(event[2]), log=False
+        )
 
-    def publish_single_event(self, player_name: str = "", event_type: str = "") -> dict:
-        """Publish a single NBA event"""
-        if player_name:
-            player = next(
-                (p for p in NBA_PLAYERS if p["name"] == player_name),
-                random.choice(NBA_PLAYERS),
-            )
-        else:
-            player = random.choice(NBA_PLAYERS)
-
-        if event_type:
-            event = next(
-                (e for e in EVENT_TYPES if e["type"] == event_type),
-                random.choice(EVENT_TYPES),
-            )
-        else:
-            event = random.choice(EVENT_TYPES)
-
-        points = random.choice(event["points"])
+    def _publish(
+        self, player: tuple, event: tuple, points: int, log: bool = True
+    ) -> Future:
+        """Publish an already-chosen player/event/points combination"""
+        name, team, _ = player
+        _, description, _ = event
 
         # Create message
         message_data = {
-            "player": player["name"],
-            "team": player["team"],
-            "event": event["description"],
+            "player": name,
+            "team": team,
+            "event": description,
             "points": points,
-            "timestamp": datetime.now().isoformat(),
-            "game_id": "LAL_vs_GSW_2024_01_15",
-        }
-
-        # Message attributes for filtering
-        attributes = {
-            "event_type": event["type"],
-            "player_rating": player["rating"],
-            "team": player["team"],
-            "points": str(points),
+            "timestamp": self._timestamp(),
+            "game_id": GAME_ID,
         }
 
         # Publish message
-        message_json = json.dumps(message_data)
         future = self.publisher.publish(
-            self.topic_path, message_json.encode("utf-8"), **attributes
+            self.topic_path,
+            orjson.dumps(message_data),
+            **_attributes_for(player, event, points),
         )
 
-        result = future.result()
-        print(
-            f"Published: {player['name']} {event['description']} ({points} pts) - Message ID: {result}"
-        )
-
-        return message_data
+        def on_published(f: Future):
+            try:
+                logger.info(
+                    "Published: %s %s (%s pts) - Message ID: %s",
+                    name,
+                    description,
+                    points,
+                    f.result(),
+                )
+            except Exception as e:
+                logger.error(
+                    "Publish failed: %s %s (%s pts) - %s", name, description, points, e
+                )
+
+        # Benchmarks skip per-message logging so it doesn't dominate the timing
+        if log:
+            future.add_done_callback(on_published)
+
+        return future
 
     def simulate_game_events(
         self, num_events: int = 10, delay_range: tuple = (0.5, 2.0)
@@ -92,19 +183,51 @@ class NBAEventProducer:
         """Simulate random NBA game events"""
         print(f"Starting NBA game simulation - publishing {num_events} events")
 
-        events = []
-        for i in range(num_events):
-            event_data = self.publish_single_event()
-            events.append(event_data)
-
-            # Add realistic timing between events
-            time.sleep(random.uniform(*delay_range))
+        # Draw every random choice for the game up front
+        rng = np.random.default_rng()
+        player_idx = rng.integers(0, len(_PLAYERS), size=num_events)
+        event_idx = rng.integers(0, len(_EVENTS), size=num_events)
+        choice_idx = rng.integers(0, _POINT_CHOICE_COUNTS[event_idx])
+        points = _POINTS_TABLE[event_idx, choice_idx]
+        # Add realistic timing between events
+        delays = rng.uniform(*delay_range, size=num_events)
+
+        publish_futures = []
+        for p, e, pts, delay in zip(
+            player_idx.tolist(), event_idx.tolist(), points.tolist(), delays.tolist()
+        ):
+            publish_futures.append(self._publish(_PLAYERS[p], _EVENTS[e], pts))
+            time.sleep(delay)
+
+        # Block once for the whole game rather than once per event
+        futures.wait(publish_futures)
 
         print("Game simulation complete!")
-        return events
+        return publish_futures
+
+    def benchmark_publish(self, num_events: int, concurrency: int = 32):
+        """Publish events as fast as possible from a pool of threads"""
+        print(f"Benchmarking publish - {num_events} events, {concurrency} threads")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            submitted = [executor.submit(self._publish_one) for _ in range(num_events)]
+            publish_futures = [f.result() for f in submitted]
+
+        futures.wait(publish_futures)
+        elapsed = time.perf_counter() - start
+
+        failed = sum(1 for f in publish_futures if f.exception() is not None)
+        print(
+            f"Published {num_events} events in {elapsed:.2f}s "
+            f"({num_events / elapsed:.0f} msg/s, {failed} failed)"
+        )
+        return publish_futures
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
     project_id = os.getenv("PROJECT_ID")
     if not project_id:
         raise ValueError("PROJECT_ID environment variable must be set")